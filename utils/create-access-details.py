@@ -4,134 +4,206 @@
 #  - The access URL (and QR code) for a Pulse for ESPHome device
 #  - A QR code for the Improv WiFi setup page
 #
-# Uses WeasyPrint for HTML → PDF conversion.
+# The page is laid out directly with fpdf2.
+#
+# Usage:
+#   create-access-details.py [MAC ...]
+#   create-access-details.py - < macs.txt   (one MAC per line on stdin)
 #
 # Required:
-#   pip install weasyprint jinja2 qrcode pillow
+#   pip install fpdf2 segno
 
 import sys
+import os
 import re
 import io
-import base64
-import qrcode
-from qrcode.image.pil import PilImage
-from jinja2 import Environment
-from weasyprint import HTML
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+import segno
+from fpdf import FPDF
 
 DEVICE_NAME_PREFIX = "pulse-for-esphome-"
 DEFAULT_MAC = "11:22:33:44:55:66"
 IMPROV_URL = "https://www.improv-wifi.com/"
+# An unset or empty XDG_CACHE_HOME means the default, per the XDG spec.
+QR_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pulse_qr"
+)
+
+# QR generator settings. They are also part of the disk cache key, so
+# changing any of them never serves a stale cached SVG.
+# Micro QR codes are excluded as most phone scanners cannot read them.
+QR_MAKE_OPTIONS = {"error": "l", "micro": False}
+# omitsize emits a viewBox rather than a fixed size, so fpdf2 can scale it.
+QR_SAVE_OPTIONS = {"kind": "svg", "scale": 10, "border": 4, "omitsize": True}
+
+# Page layout, in millimetres.
+PAGE_MARGIN_MM = 15
+QR_CODE_SIZE_MM = 50
 
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-  <head>
-    <meta charset="utf-8" />
-    <style>
-      body {
-        font-family: Helvetica, Arial, sans-serif;
-        margin: 40px;
-        line-height: 1.5;
-      }
-      h1 {
-        color: #333;
-        text-align: center;
-      }
-      p {
-        margin-bottom: 15px;
-      }
-      .section {
-        margin-top: 40px;
-        text-align: center;
-      }
-      .qr {
-        width: 200px;
-        height: 200px;
-      }
-      .url {
-        font-weight: bold;
-        margin-top: 10px;
-        word-break: break-all;
-      }
-      .label {
-        font-size: 1.1em;
-        margin-bottom: 10px;
-      }
-    </style>
-  </head>
-  <body>
-    <h1>Pulse for ESPHome Access Details</h1>
-
-    <p>
-      You have gotten your hands on a <b>Pulse for ESPHome</b> device.
-    </p>
-
-    <p>
-      You can configure the WiFi on the device by using the QRCode or Link below.
-    </p>
-
-    <div class="section">
-      <div class="label">Improv Wi-Fi Setup</div>
-      <img class="qr" src="data:image/png;base64,{{ qr_improv_base64 }}" alt="Improv QR" />
-      <div class="url">{{ improv_url }}</div>
-    </div>
-
-    <p>
-      Once it has been connected to the WiFi network you should be able to
-      connect to it with any device on the same WiFi network by scanning the QR code below,
-or    using the Link:
-    </p>
-
-    <div class="section">
-      <div class="label">Device Access URL</div>
-      <img class="qr" src="data:image/png;base64,{{ qr_device_base64 }}" alt="Device QR" />
-      <div class="url">{{ device_url }}</div>
-    </div>
-  </body>
-</html>
-"""
+_NON_HEX_RE = re.compile(r'[^0-9a-fA-F]')
 
 def clean_and_extract_mac_suffix(mac_address: str) -> str:
-    cleaned_mac = re.sub(r'[^0-9a-fA-F]', '', mac_address).upper()
+    cleaned_mac = _NON_HEX_RE.sub('', mac_address).upper()
     if len(cleaned_mac) < 6:
         raise ValueError("MAC address must contain at least 6 hex characters.")
     return cleaned_mac[-6:]
 
-def make_qr_base64(data: str) -> str:
-    """Generate a QR code for the given data and return it as base64."""
-    qr = qrcode.QRCode(box_size=10, border=4)
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white", image_factory=PilImage)
+def qr_url_payload(url: str) -> str:
+    """Uppercase a URL so it fits the denser QR alphanumeric mode.
+
+    Only done when the URL has no path, query or fragment, as the scheme
+    and host are case-insensitive but the rest of a URL is not.
+    """
+    parts = urlsplit(url)
+    if parts.path in ("", "/") and not parts.query and not parts.fragment:
+        return url.upper()
+    return url
+
+def make_qr_svg(data: str) -> bytes:
+    """Generate a QR code for the given data and return it as SVG."""
+    # segno writes the SVG directly, without an intermediate image object.
+    qr = segno.make(data, **QR_MAKE_OPTIONS)
 
     buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+    qr.save(buffer, **QR_SAVE_OPTIONS)
+    return buffer.getvalue()
+
+def cached_qr_svg(data: str) -> bytes:
+    """Return the QR code SVG for data, reusing a copy cached on disk.
+
+    Entries are keyed by a hash of the data and the generator settings, so
+    reprinting a device's details skips QR generation entirely.
+    """
+    settings = f"segno-{segno.__version__}|{QR_MAKE_OPTIONS!r}|{QR_SAVE_OPTIONS!r}"
+    key = hashlib.sha1(f"{settings}|{data}".encode("utf-8")).hexdigest()
+    cache_path = os.path.join(QR_CACHE_DIR, f"{key}.svg")
+    try:
+        with open(cache_path, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+
+    svg = make_qr_svg(data)
+    # The cache is only an optimisation, so failing to write it is not fatal.
+    # Write to a temporary name first so readers never see a partial file.
+    try:
+        os.makedirs(QR_CACHE_DIR, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(svg)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+    return svg
+
+# The Improv URL never changes, so its QR code is generated once per process.
+# It is kept in memory only, so importing this module never touches the disk.
+QR_IMPROV_SVG = make_qr_svg(qr_url_payload(IMPROV_URL))
+
+class AccessDetailsPDF(FPDF):
+    """Single A4 page of access details, positioned directly with fpdf2."""
+
+    def __init__(self):
+        super().__init__(format="A4")
+        self.set_margins(PAGE_MARGIN_MM, PAGE_MARGIN_MM)
+        self.set_auto_page_break(False)
+        self.add_page()
+
+    def heading(self, text: str):
+        self.set_font("helvetica", "B", 20)
+        self.set_text_color(0x33)
+        self.cell(0, 12, text, align="C", new_x="LMARGIN", new_y="NEXT")
+        self.set_text_color(0)
+        self.ln(4)
+
+    def paragraph(self, text: str):
+        self.set_font("helvetica", "", 12)
+        self.multi_cell(0, 7, text, markdown=True, new_x="LMARGIN", new_y="NEXT")
+        self.ln(4)
+
+    def qr_section(self, label: str, qr_svg: bytes, url: str):
+        """Draw a centred label, QR code and URL."""
+        self.ln(6)
+        self.set_font("helvetica", "", 13)
+        self.cell(0, 8, label, align="C", new_x="LMARGIN", new_y="NEXT")
+
+        qr_x = (self.w - QR_CODE_SIZE_MM) / 2
+        self.image(io.BytesIO(qr_svg), x=qr_x, y=self.get_y(),
+                   w=QR_CODE_SIZE_MM, h=QR_CODE_SIZE_MM)
+        self.set_y(self.get_y() + QR_CODE_SIZE_MM + 2)
+
+        self.set_font("helvetica", "B", 12)
+        self.multi_cell(0, 7, url, align="C", new_x="LMARGIN", new_y="NEXT")
+        self.ln(6)
 
 def generate_access_pdf(mac_address: str):
     mac_suffix = clean_and_extract_mac_suffix(mac_address)
     device_url = f"http://{DEVICE_NAME_PREFIX}{mac_suffix}.local"
     pdf_output_filename = f"pulse_esphome_access_{mac_suffix}.pdf"
 
-    # Generate QR codes
-    qr_device_base64 = make_qr_base64(device_url)
-    qr_improv_base64 = make_qr_base64(IMPROV_URL)
-
-    # Render HTML template
-    template = Environment().from_string(HTML_TEMPLATE)
-    html_content = template.render(
-        device_url=device_url,
-        qr_device_base64=qr_device_base64,
-        improv_url=IMPROV_URL,
-        qr_improv_base64=qr_improv_base64
+    # Generate the device QR code
+    qr_device_svg = cached_qr_svg(qr_url_payload(device_url))
+
+    pdf = AccessDetailsPDF()
+    pdf.heading("Pulse for ESPHome Access Details")
+    pdf.paragraph("You have gotten your hands on a **Pulse for ESPHome** device.")
+    pdf.paragraph("You can configure the WiFi on the device by using the QRCode or Link below.")
+    pdf.qr_section("Improv Wi-Fi Setup", QR_IMPROV_SVG, IMPROV_URL)
+    pdf.paragraph(
+        "Once it has been connected to the WiFi network you should be able to "
+        "connect to it with any device on the same WiFi network by scanning "
+        "the QR code below, or using the Link:"
     )
-
-    # Convert HTML → PDF
-    HTML(string=html_content).write_pdf(pdf_output_filename)
+    pdf.qr_section("Device Access URL", qr_device_svg, device_url)
+    pdf.output(pdf_output_filename)
     print(f"✅ Created {pdf_output_filename}")
 
-if __name__ == "__main__":
-    mac = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MAC
-    if len(sys.argv) == 1:
+def read_mac_addresses(argv) -> list:
+    """Collect MACs from the command line; a "-" argument reads stdin.
+
+    Stdin is read one MAC per line, and only when explicitly requested.
+    Always returns at least one MAC.
+    """
+    if not argv:
         print(f"No MAC provided, using default: {DEFAULT_MAC}")
-    generate_access_pdf(mac)
+        return [DEFAULT_MAC]
+
+    macs = []
+    for arg in argv:
+        if arg == "-":
+            macs.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            macs.append(arg)
+    if not macs:
+        sys.exit("No MAC addresses read from stdin.")
+    return macs
+
+def try_generate_access_pdf(mac_address: str):
+    """Generate one PDF, returning an error message instead of raising."""
+    try:
+        generate_access_pdf(mac_address)
+    except ValueError as e:
+        return f"{mac_address}: {e}"
+    return None
+
+if __name__ == "__main__":
+    macs = read_mac_addresses(sys.argv[1:])
+    if len(macs) == 1:
+        errors = [try_generate_access_pdf(macs[0])]
+    else:
+        # Each PDF is independent, so spread the batch over worker processes,
+        # at most one per core and never more than there are MACs. Every
+        # worker generates the Improv QR code once and reuses it for all of
+        # the MACs it is handed.
+        max_workers = min(len(macs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            errors = list(executor.map(try_generate_access_pdf, macs))
+
+    # A bad MAC does not stop the rest of the batch; report them all at the end.
+    errors = [error for error in errors if error]
+    for error in errors:
+        print(f"❌ {error}", file=sys.stderr)
+    if errors:
+        sys.exit(1)
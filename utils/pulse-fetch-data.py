@@ -2,20 +2,24 @@
 import sys
 import requests
 import time
-import os
 import csv
-from datetime import datetime, timezone
+
+# orjson is a faster native parser; fall back to the stdlib if it is absent.
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 LOG_FILE    = "energy_log.csv"
 LOG_VERSION = "powershare 1.0.0"
 
-def fetch_energy_values(device_name):
+def fetch_energy_values(device_name, session):
     """Fetch energy value (Wh) from the specified device."""
     url = f"http://{device_name}/sensor/total_energy"
     try:
-        response = requests.get(url, timeout=5)
+        response = session.get(url, timeout=5)
         response.raise_for_status()
-        data = response.json()
+        data = json_loads(response.content)
         return {"total_watt_hours_in": int(data.get("value", 0) * 1000),
                 "total_watt_hours_out": 0 }
 
@@ -23,22 +27,33 @@ def fetch_energy_values(device_name):
         print(f"Error fetching data: {e}")
         return None
 
-def write_csv_row(row):
-    """Append a row to the CSV file, creating header if missing."""
-    file_exists = os.path.exists(LOG_FILE)
-    with open(LOG_FILE, mode="a", newline="") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow([f"# Version: {LOG_VERSION}"])
-            writer.writerow(["datetime_utc", "datetime_local", "total_watt_hours_in", "total_watt_hours_out"])
-        writer.writerow(row)
-
-def sleep_until_next_minute():
-    """Sleep until the top of the next minute (e.g. xx:01:00)."""
-    now = time.time()
-    # seconds until next minute boundary
-    next_minute = 60 - (now % 60)
-    time.sleep(next_minute)
+def open_csv_log():
+    """Open the CSV file for appending, writing the header if it is empty."""
+    log_fh = open(LOG_FILE, mode="a", newline="")
+    writer = csv.writer(log_fh)
+    # An append handle starts at the end of the file, so a zero offset means
+    # the file is new (or was left empty) and needs its header.
+    if log_fh.tell() == 0:
+        writer.writerow([f"# Version: {LOG_VERSION}"])
+        writer.writerow(["datetime_utc", "datetime_local", "total_watt_hours_in", "total_watt_hours_out"])
+    return log_fh, writer
+
+def format_timestamp(t):
+    """Format a time.struct_time as "YYYY-MM-DD HH:MM:SS"."""
+    return (f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} "
+            f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}")
+
+def next_minute_boundary(t):
+    """Return the epoch time of the minute boundary after t (e.g. xx:01:00)."""
+    return (int(t) // 60 + 1) * 60
+
+def current_minute_boundary(t):
+    """Return the epoch time of the minute boundary at or before t."""
+    return int(t) // 60 * 60
+
+def sleep_until(deadline):
+    """Sleep until the given epoch time, returning at once if it has passed."""
+    time.sleep(max(0, deadline - time.time()))
 
 def main():
     if len(sys.argv) < 2:
@@ -49,27 +64,53 @@ def main():
     print(f"# Version: {LOG_VERSION}")
     print(f"# Starting energy logger — synchronizing to the top of each minute.")
 
+    log_fh, writer = open_csv_log()
+    # Reuse one keep-alive connection to the device across polls.
+    session = requests.Session()
+
+    # Poll on absolute minute boundaries anchored to a single start time, so
+    # slow fetches or writes never push later polls out of phase.
+    start_epoch = next_minute_boundary(time.time())
+    iteration = 0
+
     while True:
-        values_wh = fetch_energy_values(device_name)
-        if values_wh is not None:
-            now_utc = datetime.now(timezone.utc)
-            now_local = datetime.now()
+        deadline = start_epoch + iteration * 60
+        if deadline - time.time() > 60:
+            # The wall clock stepped backwards (e.g. an NTP correction).
+            # Re-anchor on the next boundary rather than sleeping out the gap.
+            start_epoch, iteration = next_minute_boundary(time.time()), 0
+            deadline = start_epoch
+        sleep_until(deadline)
+        now = time.time()
+        if abs(now - deadline) >= 60:
+            # Woke a minute or more away from the deadline: time.sleep() stops
+            # while the host is suspended, or the wall clock stepped during
+            # the sleep. Re-anchor on the current minute so the reading is not
+            # logged under a stale one.
+            start_epoch, iteration = current_minute_boundary(now), 0
+            deadline = start_epoch
 
+        values_wh = fetch_energy_values(device_name, session)
+        if values_wh is not None:
             total_watt_hours_in = values_wh["total_watt_hours_in"]
             total_watt_hours_out = values_wh["total_watt_hours_out"]
 
+            # Log the nominal minute boundary rather than the wake-up time,
+            # so on-time polls form a uniform one-minute time series.
             row = [
-                now_utc.strftime("%Y-%m-%d %H:%M:%S"),
-                now_local.strftime("%Y-%m-%d %H:%M:%S"),
+                format_timestamp(time.gmtime(deadline)),
+                format_timestamp(time.localtime(deadline)),
                 f"{total_watt_hours_in}",
                 f"{total_watt_hours_out}"
             ]
 
             print(",".join(row))
-            write_csv_row(row)
+            writer.writerow(row)
+            # Flush each row so it reaches the file straight away.
+            log_fh.flush()
 
-        # wait until the next minute boundary
-        sleep_until_next_minute()
+        # Move to the next minute, skipping any that a slow poll overran.
+        iteration = max(iteration + 1, int((time.time() - start_epoch) // 60) + 1)
 
 
 if __name__ == "__main__":